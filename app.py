@@ -1,90 +1,359 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
+from flask_session import Session
+import redis
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from dotenv import load_dotenv
 import os
-from PIL import Image
 import base64
 from io import BytesIO
 import numpy as np
+load_dotenv()
+# One thread budget per process for TF, TFLite and Numba. Every gunicorn worker
+# runs its own inference, so the default of 1 keeps workers from oversubscribing
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 1))
+os.environ.setdefault('NUMBA_NUM_THREADS', str(INFERENCE_THREADS))
+# oneDNN kernels (AVX2/AVX-512 dispatch) must be requested before TF is imported
+os.environ.setdefault('TF_ENABLE_ONEDNN_OPTS', '1')
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
-import cv2
+# Only takes effect before the TF runtime starts, e.g. not if the importer already ran TF
+try:
+    tf.config.threading.set_intra_op_parallelism_threads(INFERENCE_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(INFERENCE_THREADS)
+except RuntimeError as e:
+    print(f"Could not set TensorFlow thread counts ({e}); using the existing runtime settings.")
 from datetime import datetime
 import uuid
 from bson.objectid import ObjectId
 import json
+import orjson
 from guidance import WasteGuidance, guidance_bp, waste_guidance
 from constants import WASTE_EDUCATION
+from preprocessing import open_image, classification_pixels, rescale_into
 import bcrypt
 import re
+import threading
+from concurrent.futures import Future
+import queue
+
+
+class OrjsonProvider(JSONProvider):
+    """Serialize app.json output (jsonify, the tojson filter) with orjson.
+
+    Output follows DefaultJSONProvider: keys are sorted and dates go through
+    default(), keeping Flask's HTTP-date format rather than orjson's ISO 8601.
+    It otherwise differs from the stdlib encoder: output is compact (no
+    spaces after separators), non-ASCII text is written as UTF-8 instead of
+    \\u escapes, NaN and Infinity serialize as null, and integers outside the
+    64-bit range raise TypeError. Options orjson can't express (dump options
+    other than sort_keys and indent=2, or any loads option) are handed to the
+    stdlib json module so they are still honoured.
+    """
+
+    sort_keys = True
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        indent = kwargs.pop('indent', None)
+        if kwargs or indent not in (None, 2):
+            kwargs.setdefault('default', self.default)
+            return json.dumps(obj, sort_keys=sort_keys, indent=indent, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
 
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.register_blueprint(guidance_bp)
-load_dotenv()
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+app.config['BCRYPT_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+# Server-side sessions in Redis (redis-py uses the hiredis parser when installed)
+app.config['SESSION_TYPE'] = 'redis'
+# Flask-Session defaults to 31-day permanent sessions; keep browser-session logins
+app.config['SESSION_PERMANENT'] = False
+app.config['SESSION_REDIS'] = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+Session(app)
 
 # MongoDB Setup
-client = MongoClient(os.getenv('MONGO_URI'))
+# connect=False: nothing touches Mongo until a worker process uses it, so the
+# client is never connected before gunicorn forks
+client = MongoClient(os.getenv('MONGO_URI'), connect=False)
 db = client['greenguide']
 users = db['users']
 reports = db['reports']
 educational_content = db['educational_content']
+_email_index_ready = False
+
+def ensure_indexes():
+    """Create the unique index on users.email; registration relies on it to reject duplicates"""
+    global _email_index_ready
+    try:
+        users.create_index('email', unique=True)
+    except PyMongoError as e:
+        print(f"Error creating unique index on users.email: {e}. "
+              "Registration will check for existing emails itself.")
+        return False
+    _email_index_ready = True
+    return True
 
 
 
 # Load models
-try:
-    waste_classification_model = tf.keras.models.load_model('GGG/models/best_model.h5')
-    surveillance_model = tf.keras.models.load_model('GGG/models/Street_model.h5')
-    print("Models loaded successfully!")
-except Exception as e:
-    print(f"Error loading models: {e}. Please ensure models are in the 'models' directory.")
-    waste_classification_model = None
-    surveillance_model = None
+MODEL_DIR = 'GGG/models'
+
+def load_model(name):
+    """Load the fastest available build of a model: TFLite, then SavedModel, then Keras H5"""
+    for suffix in ('_int8.tflite', '_fp16.tflite'):
+        tflite_path = os.path.join(MODEL_DIR, f"{name}{suffix}")
+        if os.path.exists(tflite_path):
+            interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=INFERENCE_THREADS)
+            interpreter.allocate_tensors()
+            return interpreter
+    saved_model_path = os.path.join(MODEL_DIR, f"{name}_saved_model")
+    if os.path.isdir(saved_model_path):
+        return tf.saved_model.load(saved_model_path)
+    return tf.keras.models.load_model(os.path.join(MODEL_DIR, f"{name}.h5"))
+
+# tf.lite.Interpreter is not thread-safe
+_interpreter_lock = threading.Lock()
+
+def run_tflite(interpreter, img_array):
+    """Run a preprocessed batch through a TFLite interpreter (Keras and SavedModel classifiers use _classify_fn)"""
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    if img_array.dtype != input_details['dtype']:
+        # Float pixels for a quantized model whose input scale isn't pixel / 255
+        scale, zero_point = input_details['quantization']
+        info = np.iinfo(input_details['dtype'])
+        img_array = np.clip(np.round(img_array / scale + zero_point), info.min, info.max)
+        img_array = img_array.astype(input_details['dtype'])
+    with _interpreter_lock:
+        # Tensors are allocated for one batch size; reallocate when a batch differs
+        if tuple(interpreter.get_input_details()[0]['shape']) != img_array.shape:
+            interpreter.resize_tensor_input(input_details['index'], img_array.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_details['index'], img_array)
+        interpreter.invoke()
+        predictions = interpreter.get_tensor(output_details['index'])
+    if output_details['dtype'] != np.float32:
+        scale, zero_point = output_details['quantization']
+        predictions = (predictions.astype(np.float32) - zero_point) * scale
+    return predictions
+
+def keras_inference_fn(model):
+    """Wrap a Keras model in a traced tf.function, skipping predict()'s per-call setup"""
+    @tf.function(input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)])
+    def infer(img_array):
+        return model(img_array, training=False)
+    return infer
+
+def takes_raw_pixels(model):
+    """True for TFLite builds whose uint8 input quantization is exactly pixel / 255"""
+    if not isinstance(model, tf.lite.Interpreter):
+        return False
+    input_details = model.get_input_details()[0]
+    scale, zero_point = input_details['quantization']
+    return input_details['dtype'] == np.uint8 and zero_point == 0 and np.isclose(scale, 1 / 255.0)
+
+def saved_model_inference_fn(loaded):
+    """Call the serving_default signature of a loaded SavedModel"""
+    infer = loaded.signatures['serving_default']
+    input_name = next(iter(infer.structured_input_signature[1]))
+    def run(img_array):
+        outputs = infer(**{input_name: tf.constant(img_array)})
+        return next(iter(outputs.values()))
+    return run
+
+# Models are loaded per process by load_models(). TF's runtime is not fork-safe:
+# a worker forked from a master that has loaded a Keras model deadlocks on its
+# first op, so nothing may touch TF in the gunicorn master.
+waste_classification_model = None
+_classify_fn = None
+_RAW_PIXEL_INPUT = False
+_models_pid = None
+_models_lock = threading.Lock()
+
+def load_models():
+    """Load and warm up the classifier once per process.
+
+    gunicorn calls this from post_worker_init; otherwise it runs on first use.
+    """
+    global waste_classification_model, _classify_fn, _RAW_PIXEL_INPUT, _models_pid
+    if _models_pid == os.getpid():
+        return
+    with _models_lock:
+        if _models_pid == os.getpid():
+            return
+        try:
+            model = load_model('best_model')
+            if isinstance(model, tf.keras.Model):
+                classify_fn = keras_inference_fn(model)
+            elif not isinstance(model, tf.lite.Interpreter):
+                classify_fn = saved_model_inference_fn(model)
+            else:
+                classify_fn = None
+            waste_classification_model, _classify_fn = model, classify_fn
+            # uint8 TFLite inputs take the resized pixels as-is, skipping the /255 rescale
+            _RAW_PIXEL_INPUT = takes_raw_pixels(model)
+            # Trace the classifier and realize its kernels before the first request
+            predict_waste(np.zeros((1, 224, 224, 3), dtype=np.uint8 if _RAW_PIXEL_INPUT else np.float32))
+            print("Models loaded successfully!")
+        except Exception as e:
+            print(f"Error loading models: {e}. Please ensure models are in the 'models' directory.")
+            waste_classification_model, _classify_fn, _RAW_PIXEL_INPUT = None, None, False
+        _models_pid = os.getpid()
+
+# The surveillance model is only loaded once something actually needs it
+_surveillance_model = None
+_surveillance_model_attempted = False
+_surveillance_model_lock = threading.Lock()
+
+def get_surveillance_model():
+    """Load the surveillance model on first use; None if it failed, without retrying"""
+    global _surveillance_model, _surveillance_model_attempted
+    if not _surveillance_model_attempted:
+        with _surveillance_model_lock:
+            if not _surveillance_model_attempted:
+                try:
+                    _surveillance_model = load_model('Street_model')
+                except Exception as e:
+                    print(f"Error loading surveillance model: {e}. Please ensure models are in the 'models' directory.")
+                _surveillance_model_attempted = True
+    return _surveillance_model
+
+def predict_waste(img_array):
+    if _classify_fn is not None:
+        return _classify_fn(img_array).numpy()
+    return run_tflite(waste_classification_model, img_array)
+
+# Micro-batching: requests that queue up while a batch is running are run
+# through the classifier together in the next call. Nothing waits for a batch
+# to fill, so a lone request goes straight through.
+_BATCH_MAX = 16
+_batch_queue = queue.Queue()
+_batch_worker_pid = None
+_batch_worker_lock = threading.Lock()
+
+def _batch_worker():
+    while True:
+        items = [_batch_queue.get()]
+        while len(items) < _BATCH_MAX:
+            try:
+                items.append(_batch_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            predictions = predict_waste(np.concatenate([img for img, _ in items]))
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            continue
+        for i, (_, future) in enumerate(items):
+            future.set_result(predictions[i:i + 1])
+
+def _ensure_batch_worker():
+    global _batch_worker_pid
+    # Threads don't survive gunicorn's fork, so each worker process starts its own
+    if _batch_worker_pid != os.getpid():
+        with _batch_worker_lock:
+            if _batch_worker_pid != os.getpid():
+                threading.Thread(target=_batch_worker, daemon=True).start()
+                _batch_worker_pid = os.getpid()
+
+def predict_waste_batched(img_array):
+    """Queue a single image for the batch worker and wait for its predictions"""
+    _ensure_batch_worker()
+    future = Future()
+    _batch_queue.put((img_array, future))
+    return future.result()
 
 waste_guidance = WasteGuidance()
 
+# Static per-deployment lookups used on the /classify path
+_CLASSES = tuple(waste_guidance.waste_types)
+_GUIDANCE_CACHE = {wt: waste_guidance.get_guidance_for_waste_type(wt) for wt in _CLASSES}
+_GUIDANCE_URLS = {}
+
+def guidance_url(waste_type):
+    """url_for needs a request context, so the table is filled lazily and memoized"""
+    url = _GUIDANCE_URLS.get(waste_type)
+    if url is None:
+        url = _GUIDANCE_URLS[waste_type] = url_for('guidance.waste_guidance_view', waste_type=waste_type)
+    return url
+
+# Per-thread input buffer: Flask's dev server handles requests on several threads
+_preproc_local = threading.local()
+
+def _preproc_buffer():
+    buf = getattr(_preproc_local, 'buf', None)
+    if buf is None:
+        buf = _preproc_local.buf = np.empty((1, 224, 224, 3), dtype=np.float32)
+    return buf
+
 def preprocess_classification_image(image):
-    img = image.resize((224, 224))
-    img_array = img_to_array(img)
-    img_array = img_array / 255.0
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
+    pixels = classification_pixels(image)
+    if _RAW_PIXEL_INPUT:
+        return pixels[np.newaxis]
+    # Cast and rescale in a single pass straight into the model input buffer
+    buf = _preproc_buffer()
+    rescale_into(pixels, buf[0])
+    return buf
 
 def classify_waste(image):
+    load_models()
     if waste_classification_model is None:
         return {"error": "Model not loaded"}
     
     img_array = preprocess_classification_image(image)
-    predictions = waste_classification_model.predict(img_array)
-    classes = waste_guidance.waste_types
-    predicted_class = classes[np.argmax(predictions)]
-    confidence = float(np.max(predictions))
+    predictions = predict_waste_batched(img_array)
+    scores = predictions[0]
+    # Partial selection of the top 3, then order just those; the first is the argmax
+    top_indices = np.argpartition(scores, -3)[-3:]
+    top_indices = top_indices[np.argsort(scores[top_indices])[::-1]]
+    predicted_class = _CLASSES[top_indices[0]]
+    confidence = float(scores[top_indices[0]])
     
-    top_indices = np.argsort(predictions[0])[-3:][::-1]
     alternatives = [
-        {'waste_type': classes[idx], 'confidence': float(predictions[0][idx])}
-        for idx in top_indices[1:] if predictions[0][idx] > 0.05
+        {'waste_type': _CLASSES[idx], 'confidence': float(scores[idx])}
+        for idx in top_indices[1:] if scores[idx] > 0.05
     ]
     
     return {
         'waste_type': predicted_class,
         'confidence': confidence,
-        'guidance': waste_guidance.get_guidance_for_waste_type(predicted_class),
+        'guidance': _GUIDANCE_CACHE[predicted_class],
         'alternatives': alternatives,
-        'guidance_url': url_for('guidance.waste_guidance_view', waste_type=predicted_class)
+        'guidance_url': guidance_url(predicted_class)
     }
 # Email validation function
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 def is_valid_email(email):
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 @app.route('/')
 def index():
@@ -103,7 +372,7 @@ def login():
             return render_template('login.html')
 
         # Find user in MongoDB
-        user = users.find_one({'email': email})
+        user = users.find_one({'email': email}, {'password': 1})
         if user and bcrypt.checkpw(password, user['password']):
             session['logged_in'] = True  # Set logged_in flag
             session['email'] = email    # Consistent key
@@ -133,12 +402,18 @@ def register():
             flash('Please enter a valid email address', 'error')
             return render_template('register.html')
 
-        # Check if email already exists
-        if users.find_one({'email': email}):
+        # Retry the index build if it failed at boot; until it exists, check for an existing account first
+        if not _email_index_ready and not ensure_indexes() and users.find_one({'email': email}, {'_id': 1}):
             flash('Email already exists', 'error')
-        else:
-            hashed = bcrypt.hashpw(password, bcrypt.gensalt())
+            return render_template('register.html')
+
+        # The unique index on email rejects duplicates
+        hashed = bcrypt.hashpw(password, bcrypt.gensalt(app.config['BCRYPT_ROUNDS']))
+        try:
             users.insert_one({'email': email, 'password': hashed})
+        except DuplicateKeyError:
+            flash('Email already exists', 'error')
+        else:
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
     return render_template('register.html')
@@ -150,7 +425,7 @@ def profile():
         return redirect(url_for('login'))
     
     user_email = session.get('email')  # Consistent with login
-    user = users.find_one({'email': user_email})  # Correct MongoDB query
+    user = users.find_one({'email': user_email}, {'password': 0})  # Never send the hash to the template
     if not user:
         flash('User not found', 'error')
         return redirect(url_for('login'))
@@ -161,11 +436,14 @@ def profile():
 def classify():
     if request.method == 'POST':
         if 'image' in request.form:
-            image_data = request.form['image']
-            image = Image.open(BytesIO(base64.b64decode(image_data.split(',')[1])))
+            # Strip the data-URL header
+            _, _, b64 = request.form['image'].partition(',')
+            # Decode eagerly so the decoded bytes are released before inference
+            with BytesIO(base64.b64decode(b64, validate=False)) as bio:
+                image = open_image(bio)
         elif 'file' in request.files:
             file = request.files['file']
-            image = Image.open(file)
+            image = open_image(file)
         else:
             return render_template('classify.html', error='No image provided'), 400
         
@@ -174,18 +452,25 @@ def classify():
     
     return render_template('classify.html')
 
+_education_waste_types = None
+
+def education_waste_types():
+    """Waste types with guidance URLs, built on the first /education request"""
+    global _education_waste_types
+    if _education_waste_types is None:
+        # Add guidance URLs to waste categories using waste_guidance
+        waste_types_with_guidance = {}
+        for waste_type in _CLASSES:
+            waste_types_with_guidance[waste_type] = dict(_GUIDANCE_CACHE[waste_type] or {})
+            waste_types_with_guidance[waste_type]['guidance_url'] = guidance_url(waste_type)
+        _education_waste_types = waste_types_with_guidance
+    return _education_waste_types
+
 @app.route('/education')
 def education():
     """Educational resources about waste management"""
-    # Add guidance URLs to waste categories using waste_guidance
-    waste_types_with_guidance = {}
-    for waste_type in waste_guidance.waste_types:
-        guidance = waste_guidance.get_guidance_for_waste_type(waste_type)
-        waste_types_with_guidance[waste_type] = guidance or {}
-        waste_types_with_guidance[waste_type]['guidance_url'] = url_for('guidance.waste_guidance_view', waste_type=waste_type)
-    
     return render_template('education.html', 
-                           waste_types=waste_types_with_guidance, 
+                           waste_types=education_waste_types(), 
                            education=WASTE_EDUCATION)
 
 @app.route('/report')
@@ -208,4 +493,6 @@ def server_error(e):
 if __name__ == '__main__':
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
+    ensure_indexes()
+    load_models()
     app.run(debug=True)
\ No newline at end of file
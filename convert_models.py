@@ -0,0 +1,145 @@
+"""Convert the Keras H5 models to quantized TFLite builds.
+
+Usage: python convert_models.py <calibration_image_dir>
+
+Writes a <name>_saved_model directory, <name>_int8.tflite and
+<name>_fp16.tflite next to each H5 model. Each format is converted
+independently; a format that fails to convert (e.g. ops TFLite doesn't
+support) is skipped and any stale copy removed, so app.py falls back to the
+next build: int8, then fp16, then the SavedModel, then the H5 file. The int8
+build is kept only when it actually beats fp16 on this host (i.e. XNNPACK int8
+kernels are in use), timed with INFERENCE_THREADS threads (default 1) to match
+app.py.
+"""
+import os
+import shutil
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+from preprocessing import IMAGE_SIZE, open_image, classification_pixels, rescale_into
+
+MODEL_DIR = 'GGG/models'
+MODEL_NAMES = ['best_model', 'Street_model']
+CALIBRATION_SAMPLES = 200
+BENCHMARK_RUNS = 20
+# Benchmark with the thread count app.py serves with, so int8 vs fp16 is decided
+# under production conditions
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 1))
+
+
+def load_calibration_images(image_dir):
+    """Load and scale calibration images the same way app.py preprocesses them"""
+    images = []
+    for filename in sorted(os.listdir(image_dir))[:CALIBRATION_SAMPLES]:
+        try:
+            img = open_image(os.path.join(image_dir, filename))
+        except IOError:
+            continue
+        scaled = np.empty((1,) + IMAGE_SIZE + (3,), dtype=np.float32)
+        rescale_into(classification_pixels(img), scaled[0])
+        images.append(scaled)
+    if not images:
+        raise ValueError(f"No readable images found in {image_dir}")
+    return images
+
+
+def convert_int8(model, calibration_images):
+    """Full-integer post-training quantization with uint8 input"""
+    def representative_dataset():
+        # Pin the observed input range to exactly [0, 1] so the uint8 input
+        # scale is 1/255 and app.py can feed raw pixels
+        yield [np.zeros_like(calibration_images[0])]
+        yield [np.ones_like(calibration_images[0])]
+        for img in calibration_images:
+            yield [img]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    return converter.convert()
+
+
+def convert_fp16(model):
+    """Float16 weight quantization, used when int8 kernels are not accelerated"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def export_saved_model(model, path):
+    """Export a SavedModel with a serving_default signature for graph-mode inference"""
+    model.export(path)
+
+
+def benchmark(model_path, sample):
+    """Average single-image invoke() latency in seconds"""
+    interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=INFERENCE_THREADS)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    if input_details['dtype'] != np.float32:
+        scale, zero_point = input_details['quantization']
+        sample = np.round(sample / scale + zero_point).astype(input_details['dtype'])
+    interpreter.set_tensor(input_details['index'], sample)
+    interpreter.invoke()  # warm up
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_RUNS):
+        interpreter.invoke()
+    return (time.perf_counter() - start) / BENCHMARK_RUNS
+
+
+def write_tflite(path, convert, *args):
+    """Write one TFLite build, or remove any stale copy if conversion fails"""
+    try:
+        data = convert(*args)
+    except Exception as e:
+        print(f"{os.path.basename(path)}: conversion failed: {e}")
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def main(image_dir):
+    calibration_images = load_calibration_images(image_dir)
+    for name in MODEL_NAMES:
+        h5_path = os.path.join(MODEL_DIR, f"{name}.h5")
+        if not os.path.exists(h5_path):
+            print(f"Skipping {name}: {h5_path} not found")
+            continue
+        model = tf.keras.models.load_model(h5_path)
+
+        # The SavedModel goes first: it is the fallback when a TFLite conversion fails
+        saved_model_path = os.path.join(MODEL_DIR, f"{name}_saved_model")
+        try:
+            export_saved_model(model, saved_model_path)
+        except Exception as e:
+            print(f"{name}_saved_model: export failed: {e}")
+            shutil.rmtree(saved_model_path, ignore_errors=True)
+
+        int8_path = os.path.join(MODEL_DIR, f"{name}_int8.tflite")
+        fp16_path = os.path.join(MODEL_DIR, f"{name}_fp16.tflite")
+        int8_ok = write_tflite(int8_path, convert_int8, model, calibration_images)
+        fp16_ok = write_tflite(fp16_path, convert_fp16, model)
+        if not (int8_ok and fp16_ok):
+            continue
+
+        int8_time = benchmark(int8_path, calibration_images[0])
+        fp16_time = benchmark(fp16_path, calibration_images[0])
+        print(f"{name}: int8 {int8_time * 1000:.1f} ms, fp16 {fp16_time * 1000:.1f} ms "
+              f"({INFERENCE_THREADS} thread{'s' if INFERENCE_THREADS != 1 else ''})")
+        if int8_time >= fp16_time:
+            os.remove(int8_path)
+            print(f"{name}: int8 kernels not accelerated on this host, keeping fp16 build")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1])
@@ -2,10 +2,11 @@ import os
 import json
 from pathlib import Path
 import shutil
-from PIL import Image, ImageDraw, ImageFont
 import requests
 from io import BytesIO
 import numpy as np
+from html import escape
+import textwrap
 
 class WasteGuidance:
     def __init__(self, static_folder='static'):
@@ -13,6 +14,7 @@ class WasteGuidance:
         self.guidance_folder = os.path.join(static_folder, 'guidance')
         self.waste_types = self._get_waste_types()  # Use internal method
         self.guidance_data = self._initialize_guidance_data()  # Use internal data
+        self._cached_guidance = self._build_guidance_cache()
         self.ensure_folders_exist()
         self.ensure_guidance_images()
         
@@ -131,33 +133,42 @@ class WasteGuidance:
         }
         return guidance_data
 
+    def _build_guidance_cache(self):
+        """Precompute guidance dicts with image paths for every waste type"""
+        cache = {}
+        for waste_type, data in self.guidance_data.items():
+            base_name = waste_type.replace(" ", "_")
+            guidance = dict(data)
+            guidance['main_image'] = f'/static/guidance/{base_name}_main.svg'
+            guidance['step_images'] = [
+                f'/static/guidance/{base_name}_step{i+1}.svg'
+                for i in range(len(data['steps']))
+            ]
+            cache[waste_type] = guidance
+        return cache
+
     def get_guidance_for_waste_type(self, waste_type):
         """Get guidance information for a specific waste type"""
-        if waste_type not in self.guidance_data:
+        guidance = self._cached_guidance.get(waste_type)
+        if guidance is None:
             return None
-            
-        guidance = self.guidance_data[waste_type]
-        
-        # Add image paths
-        guidance['main_image'] = f'/static/guidance/{waste_type.replace(" ", "_")}_main.png'
-        guidance['step_images'] = [
-            f'/static/guidance/{waste_type.replace(" ", "_")}_step{i+1}.png' 
-            for i in range(len(guidance['steps']))
-        ]
-        
-        return guidance
+        # Shallow copy so callers can add keys without touching the cache
+        return dict(guidance)
         
     def ensure_guidance_images(self):
         """Ensure that guidance images exist for all waste types"""
         for waste_type in self.waste_types:
             if waste_type in self.guidance_data:
                 self._generate_guidance_images(waste_type)
+
+    def _main_image_path(self, waste_type):
+        return os.path.join(self.guidance_folder, f'{waste_type.replace(" ", "_")}_main.svg')
     
     def _generate_guidance_images(self, waste_type):
         """Generate visual guidance images for a waste type"""
         # Skip if images already exist
         base_filename = os.path.join(self.guidance_folder, waste_type.replace(" ", "_"))
-        main_image_path = f"{base_filename}_main.png"
+        main_image_path = self._main_image_path(waste_type)
         
         if os.path.exists(main_image_path):
             return
@@ -168,121 +179,72 @@ class WasteGuidance:
         icon = guidance.get('icon', '♻️')
         
         # Generate main image
-        img = self._create_main_guidance_image(waste_type, colors, icon)
-        img.save(main_image_path)
+        with open(main_image_path, 'w', encoding='utf-8') as f:
+            f.write(self._create_main_guidance_image(waste_type, colors, icon))
         
         # Generate step images
         for i, step in enumerate(steps):
-            step_img = self._create_step_guidance_image(
+            step_svg = self._create_step_guidance_image(
                 step, 
                 i+1, 
                 len(steps), 
                 colors[i % len(colors)], 
                 waste_type
             )
-            step_img.save(f"{base_filename}_step{i+1}.png")
+            with open(f"{base_filename}_step{i+1}.svg", 'w', encoding='utf-8') as f:
+                f.write(step_svg)
     
     def _create_main_guidance_image(self, waste_type, colors, icon):
-        """Create a main guidance image for a waste type"""
+        """Create the SVG markup of a main guidance image for a waste type"""
         width, height = 800, 400
-        img = Image.new('RGB', (width, height), color=colors[0])
-        draw = ImageDraw.Draw(img)
         
-        # Try to load a font, fall back to default if not available
-        try:
-            title_font = ImageFont.truetype("arial.ttf", 48)
-            subtitle_font = ImageFont.truetype("arial.ttf", 24)
-        except IOError:
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-        
-        # Draw title
-        title_text = f"{waste_type} {icon}"
-        text_width = draw.textlength(title_text, font=title_font)
-        draw.text(
-            ((width - text_width) / 2, 80), 
-            title_text, 
-            fill=colors[2], 
-            font=title_font
+        # Decorative elements
+        rects = ''.join(
+            f'<rect x="{i * 60}" y="{height - 100 + i * 5}" width="300" height="50" '
+            f'fill="{colors[i % len(colors)]}"/>'
+            for i in range(5)
         )
         
-        # Draw subtitle
-        subtitle = "Proper Disposal Guide"
-        subtitle_width = draw.textlength(subtitle, font=subtitle_font)
-        draw.text(
-            ((width - subtitle_width) / 2, 150), 
-            subtitle, 
-            fill=colors[2], 
-            font=subtitle_font
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}" font-family="Arial, sans-serif">'
+            f'<rect width="100%" height="100%" fill="{colors[0]}"/>'
+            f'<text x="{width // 2}" y="80" font-size="48" text-anchor="middle" '
+            f'dominant-baseline="hanging" fill="{colors[2]}">{escape(f"{waste_type} {icon}")}</text>'
+            f'<text x="{width // 2}" y="150" font-size="24" text-anchor="middle" '
+            f'dominant-baseline="hanging" fill="{colors[2]}">Proper Disposal Guide</text>'
+            f'{rects}</svg>'
         )
-        
-        # Draw decorative elements
-        for i in range(5):
-            offset = i * 60
-            draw.rectangle(
-                [offset, height - 100 + (i * 5), offset + 300, height - 50 + (i * 5)],
-                fill=colors[i % len(colors)]
-            )
-        
-        return img
     
     def _create_step_guidance_image(self, step_text, step_num, total_steps, color, waste_type):
-        """Create an image for a specific disposal step"""
+        """Create the SVG markup of an image for a specific disposal step"""
         width, height = 600, 300
-        img = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(img)
         
-        # Try to load fonts
-        try:
-            header_font = ImageFont.truetype("arial.ttf", 24)
-            step_font = ImageFont.truetype("arial.ttf", 20)
-        except IOError:
-            header_font = ImageFont.load_default()
-            step_font = ImageFont.load_default()
-        
-        # Draw header
-        header = f"{waste_type}: Step {step_num} of {total_steps}"
-        draw.rectangle([0, 0, width, 50], fill=color)
-        header_width = draw.textlength(header, font=header_font)
-        draw.text(
-            ((width - header_width) / 2, 10),
-            header,
-            fill='white',
-            font=header_font
+        # Wrap text by character count; the browser does the actual layout
+        lines = textwrap.wrap(step_text, width=50) or ['']
+        tspans = ''.join(
+            f'<tspan x="{width // 2}" dy="{0 if i == 0 else 30}">{escape(line)}</tspan>'
+            for i, line in enumerate(lines)
         )
         
-        # Draw step text
-        # Wrap text to fit width
-        words = step_text.split()
-        lines = []
-        current_line = words[0]
-        
-        for word in words[1:]:
-            test_line = current_line + " " + word
-            if draw.textlength(test_line, font=step_font) < width - 40:
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word
-        lines.append(current_line)
-        
-        y_position = 80
-        for line in lines:
-            line_width = draw.textlength(line, font=step_font)
-            draw.text(
-                ((width - line_width) / 2, y_position),
-                line,
-                fill='black',
-                font=step_font
-            )
-            y_position += 30
-        
-        # Draw progress bar
+        # Progress bar
         progress_width = int((step_num / total_steps) * (width - 100))
-        draw.rectangle([50, height - 50, width - 50, height - 30], outline='lightgray', width=1)
-        draw.rectangle([50, height - 50, 50 + progress_width, height - 30], fill=color)
         
-        return img
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}" font-family="Arial, sans-serif">'
+            f'<rect width="100%" height="100%" fill="white"/>'
+            f'<rect x="0" y="0" width="{width}" height="50" fill="{color}"/>'
+            f'<text x="{width // 2}" y="10" font-size="24" text-anchor="middle" '
+            f'dominant-baseline="hanging" fill="white">'
+            f'{escape(f"{waste_type}: Step {step_num} of {total_steps}")}</text>'
+            f'<text x="{width // 2}" y="80" font-size="20" text-anchor="middle" '
+            f'dominant-baseline="hanging" fill="black">{tspans}</text>'
+            f'<rect x="50" y="{height - 50}" width="{width - 100}" height="20" '
+            f'fill="none" stroke="lightgray" stroke-width="1"/>'
+            f'<rect x="50" y="{height - 50}" width="{progress_width}" height="20" fill="{color}"/>'
+            f'</svg>'
+        )
 
 from flask import Blueprint, render_template
 
@@ -296,5 +258,5 @@ def waste_guidance_view(waste_type):
     if not guidance:
         return render_template('404.html'), 404
     # Remove dependency on WASTE_CATEGORIES since it's now internal
-    waste_info = waste_guidance.guidance_data.get(waste_type, {})
-    return render_template('waste_guidance.html', waste_type=waste_type, guidance=guidance, waste_info=waste_info)
\ No newline at end of file
+    # waste_info keeps main_image/step_images, which guidance_data no longer carries
+    return render_template('waste_guidance.html', waste_type=waste_type, guidance=guidance, waste_info=guidance)
\ No newline at end of file
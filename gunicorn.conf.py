@@ -0,0 +1,17 @@
+# Run with: gunicorn app:app
+# preload_app imports the app once in the master (Numba JIT, guidance images);
+# Mongo and TensorFlow are only touched in the workers, since neither is fork-safe.
+import threading
+
+preload_app = True
+workers = 4
+# Threaded workers let concurrent /classify requests share one batched model call
+worker_class = 'gthread'
+threads = 4
+
+
+def post_worker_init(worker):
+    # The index build runs in the background so an unreachable Mongo can't stall boot
+    from app import ensure_indexes, load_models
+    threading.Thread(target=ensure_indexes, daemon=True).start()
+    load_models()
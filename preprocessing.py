@@ -0,0 +1,53 @@
+"""Image preprocessing shared by the classifier and convert_models.py"""
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+# JPEGs are decoded at a reduced scale no smaller than this
+DRAFT_SIZE = (448, 448)
+INV255 = np.float32(1 / 255.0)
+
+
+def open_image(fp):
+    """Open and fully decode an image, letting JPEGs decode at reduced scale"""
+    image = Image.open(fp)
+    image.draft('RGB', DRAFT_SIZE)  # no-op for non-JPEG images
+    image.load()
+    return image
+
+
+def classification_pixels(image):
+    """Resize to model resolution and return the RGB pixels as a uint8 array"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    img = image.resize(IMAGE_SIZE, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def rescale_numpy(src_u8, dst_f32):
+    """Write src_u8 / 255 into dst_f32 in one pass"""
+    np.multiply(src_u8, INV255, out=dst_f32, casting='unsafe')
+
+
+try:
+    from numba import njit
+
+    @njit(fastmath=True, nogil=True, cache=True)
+    def _rescale_kernel(src_u8, dst_f32):
+        for i in range(src_u8.size):
+            dst_f32[i] = src_u8[i] * INV255
+
+    def rescale_into(src_u8, dst_f32):
+        """Write src_u8 / 255 into dst_f32 in one pass"""
+        # Flat contiguous views let Numba vectorize the loop; the kernel is serial
+        # and releases the GIL, so request threads can run it concurrently
+        _rescale_kernel(src_u8.reshape(-1), dst_f32.reshape(-1))
+
+    # Compile at import so the first request doesn't pay for it. Arrays backed by
+    # a PIL image are read-only, which Numba types separately, so warm up with one
+    _warmup_src = np.zeros((224, 224, 3), dtype=np.uint8)
+    _warmup_src.setflags(write=False)
+    rescale_into(_warmup_src, np.empty((224, 224, 3), dtype=np.float32))
+    del _warmup_src
+except ImportError:
+    rescale_into = rescale_numpy